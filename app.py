@@ -1,169 +1,283 @@
 import streamlit as st
 import json
+import re
+import functools
+import time
+import uuid
 import google.generativeai as genai
+from dataclasses import dataclass, field
 from datetime import datetime
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@dataclass(slots=True)
+class Response:
+    """A saved answer to one questionnaire question"""
+    answer: str
+    followup: list = field(default_factory=list)
+    timestamp: Optional[float] = None  # time.time() when saved; formatted only on export
 
 # Configure Gemini AI
+@st.cache_resource(show_spinner=False)
 def configure_gemini():
-    """Configure Gemini AI with API key from Streamlit secrets"""
-    try:
-        api_key = st.secrets["GEMINI_API_KEY"]
-    except Exception:
-        st.error("GEMINI_API_KEY not found in Streamlit secrets!")
-        return None
-    
+    """Configure Gemini AI with API key from Streamlit secrets (cached; raises if the key is missing)"""
+    api_key = st.secrets["GEMINI_API_KEY"]
     genai.configure(api_key=api_key)
     return genai.GenerativeModel('gemini-1.5-flash')
 
 
-def load_questions_from_json():
-    """Load questions from local bpr.json file"""
-    try:
-        with open('bpr.json', 'r') as file:
-            data = json.load(file)
-            # Restructure the data to organize by sections
-            sections = {}
-            questionnaire = data.get('bpr_questionnaire', {})
-            
-            for section_key, questions in questionnaire.items():
-                # Clean up section names
-                section_name = section_key.replace('_questions', '').replace('_', ' ').title()
-                if section_name == 'Company Questions':
-                    section_name = 'Company'
-                elif section_name == 'Gl Questions':
-                    section_name = 'General Ledger'
-                elif section_name == 'Financial Reports Questions':
-                    section_name = 'Financial Reports'
-                elif section_name == 'Cash Questions':
-                    section_name = 'Cash Management'
-                elif section_name == 'Ap Questions':
-                    section_name = 'Accounts Payable'
-                elif section_name == 'Ar Questions':
-                    section_name = 'Accounts Receivable'
-                elif section_name == 'Pea Questions':
-                    section_name = 'Prepaid Expense Amortization'
-                
-                sections[section_name] = questions
+# Display names for section keys that don't title-case cleanly
+_SECTION_NAME_OVERRIDES = {
+    'company_questions': 'Company',
+    'gl_questions': 'General Ledger',
+    'financial_reports_questions': 'Financial Reports',
+    'cash_questions': 'Cash Management',
+    'ap_questions': 'Accounts Payable',
+    'ar_questions': 'Accounts Receivable',
+    'pea_questions': 'Prepaid Expense Amortization'
+}
+
+@st.cache_data(show_spinner=False)
+def load_questions_from_json() -> dict:
+    """Load questions from local bpr.json file (cached; raises on read/parse errors)"""
+    with open('bpr.json', 'r') as file:
+        data = orjson.loads(file.read()) if orjson else json.load(file)
+        # Restructure the data to organize by sections
+        sections = {}
+        questionnaire = data.get('bpr_questionnaire', {})
+        
+        for section_key, questions in questionnaire.items():
+            # Clean up section names
+            section_name = _SECTION_NAME_OVERRIDES.get(section_key) or section_key.replace('_questions', '').replace('_', ' ').title()
             
-            return sections
-    except FileNotFoundError:
-        st.error("bpr.json file not found in the current directory!")
-        return {}
-    except json.JSONDecodeError:
-        st.error("Invalid JSON format in bpr.json!")
-        return {}
+            sections[section_name] = questions
+        
+        return sections
+
+# Gemini verdict parsing: a leading ADEQUATE, or NEEDS_FOLLOWUP followed by the
+# question (optionally wrapped in brackets/quotes, which are dropped)
+_ADEQUATE_RE = re.compile(r'^\s*ADEQUATE\b')
+_FOLLOWUP_RE = re.compile(r'NEEDS_FOLLOWUP[\s:\[\]"\']*(.*)', re.DOTALL)
+
+# Prompt for single-answer validation; filled with str.format per call
+_VALIDATE_TEMPLATE = """
+    You are an expert ERP implementation consultant validating responses for a BRP (Business Requirements Planning) questionnaire. Your goal is to ensure responses contain sufficient detail for proper Sage Intacct configuration.
+
+    ORIGINAL QUESTION: {question}
+    CONTEXT: {context}
+    USER'S RESPONSE: {user_answer}{context_section}
+
+    EVALUATION CRITERIA:
+    A response is ADEQUATE only if it meets ALL these requirements:
+    1. SPECIFICITY: Contains specific names, numbers, amounts, or technical details (not vague terms)
+    2. COMPLETENESS: Fully answers what was asked without leaving major gaps
+    3. RELEVANCE: Directly addresses the question asked
+    4. ERP-READY: Provides actionable information for system configuration
+
+    INADEQUATE RESPONSE EXAMPLES THAT NEED FOLLOW-UP:
+    - Generic terms without specifics: "SQL database" → needs specific system name and version
+    - Vague quantities: "some customers" → needs actual numbers and categorization
+    - Yes/No without context: "Yes, we use accounting software" → needs software name and details
+    - Missing critical details: "We pay suppliers" → needs payment methods, frequency, terms
+    - Incomplete processes: "Manual invoicing" → needs current tools, frequency, volume details
+    - Technical terms without context: "Cloud hosting" → needs provider, setup, specifications
+
+    ADEQUATE RESPONSE EXAMPLES (NO FOLLOW-UP NEEDED):
+    - "Microsoft SQL Server 2019 hosted on AWS with 2TB data"
+    - "23 active customers: 15 small clinics (£10K contracts), 8 enterprise (£100K+)"
+    - "Net 30 payment terms for most suppliers, Net 15 for software vendors, process payments twice weekly via BACS"
+    - "Manual Excel invoicing, 50+ invoices monthly, using basic templates, takes 2 days per month-end"
+
+    IMPORTANT GUIDELINES:
+    - Only ask for follow-up if the response genuinely lacks critical ERP implementation details
+    - If the answer shows good understanding and provides reasonable detail, mark as ADEQUATE
+    - Consider the user's business context and size when evaluating adequacy
+    - A small business saying "5 customers" is adequate; "some customers" is not
+
+    RESPONSE FORMAT:
+    If adequate: Return exactly "ADEQUATE"
+    If inadequate: Return "NEEDS_FOLLOWUP" followed by exactly ONE specific follow-up question.
+
+    FOLLOW-UP QUESTION GUIDELINES:
+    - Ask for the MOST CRITICAL missing detail for ERP configuration
+    - Be specific about what information is needed
+    - Include examples to guide the user
+    - Make it clear and actionable
+
+    EXAMPLE EVALUATIONS:
+
+    Question: "What database system do you currently use?"
+    User Answer: "SQL Server"
+    Evaluation: Missing version and hosting details critical for ERP integration
+    Response: NEEDS_FOLLOWUP Which version of SQL Server are you using and where is it hosted? (e.g., SQL Server 2019 on-premises, SQL Server 2022 on Azure)
+
+    Question: "How many active customers do you have?"
+    User Answer: "Around 20 customers mostly healthcare"
+    Evaluation: Has reasonable specificity for business planning
+    Response: ADEQUATE
+
+    Question: "What are your current business challenges?"
+    User Answer: "Things are difficult"
+    Evaluation: Too vague, needs specific operational issues
+    Response: NEEDS_FOLLOWUP What specific business processes or systems are causing problems? (e.g., manual invoicing taking too long, difficulty tracking inventory, poor financial reporting)
+
+    Question: "What payment terms do you offer customers?"
+    User Answer: "Net 30"
+    Evaluation: Adequate for basic ERP setup
+    Response: ADEQUATE
+
+    Now evaluate the user's response:
+    """
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def _validate_cached(_model, question, user_answer, context=None, previous_qa_pairs=()):
+    """Run Gemini validation, memoized on question, answer, context and previous Q&A pairs"""
+    # Build context with previous Q&A pairs if available
+    context_section = ""
+    if previous_qa_pairs and len(previous_qa_pairs) > 0:
+        context_section = "\n\nPREVIOUS QUESTIONS AND ANSWERS FOR CONTEXT:\n"
+        for i, (qa_question, qa_answer) in enumerate(previous_qa_pairs[-3:], 1):  # Only last 3 for context
+            context_section += f"{i}. Q: {qa_question}\n   A: {qa_answer}\n"
+    
+    prompt = _VALIDATE_TEMPLATE.format(
+        question=question,
+        context=context or 'General BRP questionnaire for ERP implementation',
+        user_answer=user_answer,
+        context_section=context_section
+    )
+    
+    # Stream so an ADEQUATE verdict (the first token) can return without waiting for the rest
+    chunks = []
+    for chunk in _model.generate_content(prompt, stream=True):
+        chunks.append(chunk.text)
+        if len(chunks) == 1 and _ADEQUATE_RE.match(chunks[0]):
+            return True, ()
+    response_text = "".join(chunks).strip()
+    
+    # Parse the response
+    if _ADEQUATE_RE.match(response_text):
+        return True, ()
+    
+    match = _FOLLOWUP_RE.search(response_text)
+    if match:
+        # Extract the follow-up question
+        followup_question = match.group(1).strip(' \t\r\n[]"\'').replace('\n', ' ')
+        
+        if followup_question and len(followup_question) > 10:
+            return False, (followup_question,)  # Return as single-item tuple for consistency
+        else:
+            return True, ()  # If we can't extract a proper question, consider adequate
+    
+    # Default to adequate if response format is unclear
+    return True, ()
+
+
+# Placeholder words that don't count toward the local "detailed answer" word threshold
+_PLACEHOLDER_WORDS = frozenset({'yes', 'no', 'n/a', 'na', 'sql', 'tbd', 'maybe', 'idk', 'none'})
 
 def validate_response(model, question, user_answer, context=None, previous_qa_pairs=None):
     """Enhanced validation for BRP questionnaire responses with context-aware single follow-up"""
+    # Long answers with enough substantive words are accepted locally without a Gemini round-trip
+    stripped = user_answer.strip()
+    if len(stripped) >= 80:
+        words = (word.strip('.,;:!?()"\'').lower() for word in stripped.split())
+        if sum(1 for word in words if word and word not in _PLACEHOLDER_WORDS) >= 15:
+            return True, []
+    
     if not model:
         return True, []
     
     try:
-        # Build context with previous Q&A pairs if available
-        context_section = ""
-        if previous_qa_pairs and len(previous_qa_pairs) > 0:
-            context_section = "\n\nPREVIOUS QUESTIONS AND ANSWERS FOR CONTEXT:\n"
-            for i, qa in enumerate(previous_qa_pairs[-3:], 1):  # Only last 3 for context
-                context_section += f"{i}. Q: {qa['question']}\n   A: {qa['answer']}\n"
-        
-        prompt = f"""
-        You are an expert ERP implementation consultant validating responses for a BRP (Business Requirements Planning) questionnaire. Your goal is to ensure responses contain sufficient detail for proper Sage Intacct configuration.
-
-        ORIGINAL QUESTION: {question}
-        CONTEXT: {context if context else 'General BRP questionnaire for ERP implementation'}
-        USER'S RESPONSE: {user_answer}{context_section}
-
-        EVALUATION CRITERIA:
-        A response is ADEQUATE only if it meets ALL these requirements:
-        1. SPECIFICITY: Contains specific names, numbers, amounts, or technical details (not vague terms)
-        2. COMPLETENESS: Fully answers what was asked without leaving major gaps
-        3. RELEVANCE: Directly addresses the question asked
-        4. ERP-READY: Provides actionable information for system configuration
-
-        INADEQUATE RESPONSE EXAMPLES THAT NEED FOLLOW-UP:
-        - Generic terms without specifics: "SQL database" → needs specific system name and version
-        - Vague quantities: "some customers" → needs actual numbers and categorization
-        - Yes/No without context: "Yes, we use accounting software" → needs software name and details
-        - Missing critical details: "We pay suppliers" → needs payment methods, frequency, terms
-        - Incomplete processes: "Manual invoicing" → needs current tools, frequency, volume details
-        - Technical terms without context: "Cloud hosting" → needs provider, setup, specifications
-
-        ADEQUATE RESPONSE EXAMPLES (NO FOLLOW-UP NEEDED):
-        - "Microsoft SQL Server 2019 hosted on AWS with 2TB data"
-        - "23 active customers: 15 small clinics (£10K contracts), 8 enterprise (£100K+)"
-        - "Net 30 payment terms for most suppliers, Net 15 for software vendors, process payments twice weekly via BACS"
-        - "Manual Excel invoicing, 50+ invoices monthly, using basic templates, takes 2 days per month-end"
-
-        IMPORTANT GUIDELINES:
-        - Only ask for follow-up if the response genuinely lacks critical ERP implementation details
-        - If the answer shows good understanding and provides reasonable detail, mark as ADEQUATE
-        - Consider the user's business context and size when evaluating adequacy
-        - A small business saying "5 customers" is adequate; "some customers" is not
-
-        RESPONSE FORMAT:
-        If adequate: Return exactly "ADEQUATE"
-        If inadequate: Return "NEEDS_FOLLOWUP" followed by exactly ONE specific follow-up question.
-
-        FOLLOW-UP QUESTION GUIDELINES:
-        - Ask for the MOST CRITICAL missing detail for ERP configuration
-        - Be specific about what information is needed
-        - Include examples to guide the user
-        - Make it clear and actionable
-
-        EXAMPLE EVALUATIONS:
-
-        Question: "What database system do you currently use?"
-        User Answer: "SQL Server"
-        Evaluation: Missing version and hosting details critical for ERP integration
-        Response: NEEDS_FOLLOWUP Which version of SQL Server are you using and where is it hosted? (e.g., SQL Server 2019 on-premises, SQL Server 2022 on Azure)
-
-        Question: "How many active customers do you have?"
-        User Answer: "Around 20 customers mostly healthcare"
-        Evaluation: Has reasonable specificity for business planning
-        Response: ADEQUATE
-
-        Question: "What are your current business challenges?"
-        User Answer: "Things are difficult"
-        Evaluation: Too vague, needs specific operational issues
-        Response: NEEDS_FOLLOWUP What specific business processes or systems are causing problems? (e.g., manual invoicing taking too long, difficulty tracking inventory, poor financial reporting)
-
-        Question: "What payment terms do you offer customers?"
-        User Answer: "Net 30"
-        Evaluation: Adequate for basic ERP setup
-        Response: ADEQUATE
-
-        Now evaluate the user's response:
-        """
-        
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        # Parse the response
-        if "ADEQUATE" in response_text and "NEEDS_FOLLOWUP" not in response_text:
-            return True, []
-        elif "NEEDS_FOLLOWUP" in response_text:
-            # Extract the follow-up question
-            followup_part = response_text.split("NEEDS_FOLLOWUP", 1)[1].strip()
-            
-            # Clean up the question - remove any formatting
-            followup_question = followup_part.strip('[]"\'')
-            followup_question = followup_question.replace('\n', ' ').strip()
-            
-            if followup_question and len(followup_question) > 10:
-                return False, [followup_question]  # Return as single-item list for consistency
-            else:
-                return True, []  # If we can't extract a proper question, consider adequate
-        
-        # Default to adequate if response format is unclear
-        return True, []
-        
+        qa_pairs = tuple((qa['question'], qa['answer']) for qa in previous_qa_pairs or [])
+        is_adequate, followup_questions = _validate_cached(model, question, user_answer, context, qa_pairs)
+        return is_adequate, list(followup_questions)
     except Exception as e:
         print(f"Error validating response: {str(e)}")
         return True, []  # Default to adequate if error occurs
 
 
+# Prompt for validating several answers in one request; items are passed as a JSON array
+_BATCH_VALIDATE_TEMPLATE = """
+    You are an expert ERP implementation consultant validating responses for a BRP (Business Requirements Planning) questionnaire. Your goal is to ensure responses contain sufficient detail for proper Sage Intacct configuration.
+
+    Evaluate each item below using these criteria. A response is ADEQUATE only if it is specific (names, numbers, amounts or technical details), complete, relevant to the question, and actionable for system configuration. Consider the user's business context and size: a small business saying "5 customers" is adequate; "some customers" is not. Only ask for follow-up if a response genuinely lacks critical ERP implementation details.
+
+    RESPONSE FORMAT:
+    Respond with ONLY a JSON array containing one object per item, in this shape:
+    [{{"index": 0, "verdict": "ADEQUATE", "followups": []}}, {{"index": 1, "verdict": "NEEDS_FOLLOWUP", "followups": ["Which version of SQL Server are you using and where is it hosted? (e.g., SQL Server 2019 on-premises)"]}}]
+    For NEEDS_FOLLOWUP, give exactly ONE specific, actionable follow-up question asking for the most critical missing detail, with examples to guide the user.
+
+    ITEMS:
+    {items}
+    """
+
+# The array of verdicts, possibly wrapped in prose or a code fence
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
+# Items per Gemini request, so each batch's verdicts fit within the model's output limit
+_BATCH_SIZE = 25
+
+def _validate_batch_chunk(model, items):
+    """Validate one chunk of items with a single Gemini request; raises if the reply can't be parsed"""
+    payload = [
+        {
+            "index": i,
+            "question": question,
+            "context": context or 'General BRP questionnaire for ERP implementation',
+            "answer": answer
+        }
+        for i, (question, answer, context) in enumerate(items)
+    ]
+    if orjson:
+        items_json = orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()
+    else:
+        items_json = json.dumps(payload, indent=2)
+    prompt = _BATCH_VALIDATE_TEMPLATE.format(items=items_json)
+    response_text = model.generate_content(prompt).text
+    
+    match = _JSON_ARRAY_RE.search(response_text)
+    if not match:
+        raise ValueError("No JSON array of verdicts in response")
+    verdicts = (orjson.loads if orjson else json.loads)(match.group(0))
+    if not isinstance(verdicts, list):
+        raise ValueError("Verdicts are not a JSON array")
+    
+    results = [(True, []) for _ in items]
+    for verdict in verdicts:
+        if not isinstance(verdict, dict):
+            continue
+        index = verdict.get('index')
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < len(items):
+            continue
+        followups = verdict.get('followups')
+        if verdict.get('verdict') == 'NEEDS_FOLLOWUP' and isinstance(followups, list):
+            followups = [q for q in followups if isinstance(q, str) and len(q) > 10]
+            if followups:
+                results[index] = (False, followups[:1])
+    return results  # Items without a usable verdict default to adequate
+
+def validate_responses_batch(model, items):
+    """Validate (question, answer, context) items in batched Gemini requests; returns (results, ok)"""
+    # ok is False if any request failed or its reply couldn't be parsed; results are then empty
+    if not model or not items:
+        return [(True, []) for _ in items], True
+    
+    results = []
+    try:
+        for start in range(0, len(items), _BATCH_SIZE):
+            results.extend(_validate_batch_chunk(model, items[start:start + _BATCH_SIZE]))
+    except Exception as e:
+        print(f"Error validating responses: {str(e)}")
+        return [], False
+    
+    return results, True
+
+
 def get_previous_qa_context(section_name, current_question_index):
     """Get previous questions and answers for context"""
     if section_name not in st.session_state.responses:
@@ -175,10 +289,10 @@ def get_previous_qa_context(section_name, current_question_index):
     
     # Get previous answered questions in this section
     for i in range(min(current_question_index, len(questions))):
-        if i in responses:
+        if responses[i] is not None:
             previous_qa.append({
                 'question': questions[i]['question'],
-                'answer': responses[i]['answer']
+                'answer': responses[i].answer
             })
     
     return previous_qa
@@ -196,8 +310,8 @@ def initialize_session_state():
         st.session_state.responses = {}
     if 'section_progress' not in st.session_state:
         st.session_state.section_progress = {}
-    if 'completed_sections' not in st.session_state:
-        st.session_state.completed_sections = set()
+    if 'answered' not in st.session_state:
+        reset_progress_state()
     if 'followup_mode' not in st.session_state:
         st.session_state.followup_mode = False
     if 'followup_questions' not in st.session_state:
@@ -212,22 +326,40 @@ def initialize_session_state():
         st.session_state.editing_mode = False
     if 'editing_question' not in st.session_state:
         st.session_state.editing_question = None
+    if 'review_flags' not in st.session_state:
+        st.session_state.review_flags = {}
+
+def reset_progress_state():
+    """Precompute section sizes and reset answered-question tracking for the loaded sections"""
+    sections = st.session_state.sections
+    st.session_state.section_sizes = {name: len(questions) for name, questions in sections.items()}
+    st.session_state.total_questions = sum(st.session_state.section_sizes.values())
+    # Per-section bitmask of answered question indices, plus its popcount
+    st.session_state.answered = {name: 0 for name in sections}
+    st.session_state.answered_counts = {name: 0 for name in sections}
+
+def get_completed_sections():
+    """Names of sections whose questions have all been answered"""
+    section_sizes = st.session_state.section_sizes
+    return {name for name, count in st.session_state.answered_counts.items() if count == section_sizes[name]}
+
+# Short descriptions shown under each section on the selection screen
+_SECTION_DESCRIPTIONS = {
+    'Company': 'basic company information and project details',
+    'Security': 'security settings and access controls',
+    'General Ledger': 'general ledger configuration and accounting settings',
+    'Financial Reports': 'financial reporting requirements',
+    'Cash Management': 'cash and bank account management',
+    'Accounts Payable': 'supplier and payment management',
+    'Purchasing': 'purchasing process and workflow',
+    'Accounts Receivable': 'customer and invoice management',
+    'Order Entry': 'sales order and invoicing process',
+    'Prepaid Expense Amortization': 'prepaid expense handling and amortization'
+}
 
 def get_section_description(section_name):
     """Get description for each section"""
-    descriptions = {
-        'Company': 'basic company information and project details',
-        'Security': 'security settings and access controls',
-        'General Ledger': 'general ledger configuration and accounting settings',
-        'Financial Reports': 'financial reporting requirements',
-        'Cash Management': 'cash and bank account management',
-        'Accounts Payable': 'supplier and payment management',
-        'Purchasing': 'purchasing process and workflow',
-        'Accounts Receivable': 'customer and invoice management',
-        'Order Entry': 'sales order and invoicing process',
-        'Prepaid Expense Amortization': 'prepaid expense handling and amortization'
-    }
-    return descriptions.get(section_name, 'system configuration')
+    return _SECTION_DESCRIPTIONS.get(section_name, 'system configuration')
 
 def display_progress_sidebar():
     """Display progress for each section in sidebar"""
@@ -239,7 +371,7 @@ def display_progress_sidebar():
         
         for section_name, questions in st.session_state.sections.items():
             section_total = len(questions)
-            section_answered = len([q for q in questions if q.get('answered', False)])
+            section_answered = st.session_state.answered_counts[section_name]
             
             total_questions += section_total
             total_answered += section_answered
@@ -250,7 +382,6 @@ def display_progress_sidebar():
             # Section status emoji
             if section_answered == section_total:
                 status = "✅"
-                st.session_state.completed_sections.add(section_name)
             elif section_answered > 0:
                 status = "🔄"
             else:
@@ -267,19 +398,95 @@ def display_progress_sidebar():
         st.progress(overall_progress)
         st.caption(f"{total_answered}/{total_questions} total questions")
 
-def save_response(section, question_index, answer, followup_data=None):
-    """Save response for a question"""
+# Append-only per-session response logs, replayed when a session is reloaded
+_SESSIONS_DIR = 'sessions'
+_SESSION_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+def get_session_log_path():
+    """Path of this session's response log, keyed by the ?session= query param"""
+    session_id = st.query_params.get("session", "")
+    if not _SESSION_ID_RE.fullmatch(session_id):
+        session_id = uuid.uuid4().hex
+        st.query_params["session"] = session_id
+    return os.path.join(_SESSIONS_DIR, f"{session_id}.jsonl")
+
+def append_response_log(section, question_index, response):
+    """Append one saved response to the session log"""
+    record = {
+        'section': section,
+        'q': question_index,
+        'answer': response.answer,
+        'followup': response.followup,
+        'timestamp': response.timestamp
+    }
+    line = orjson.dumps(record) if orjson else json.dumps(record).encode()
+    try:
+        os.makedirs(_SESSIONS_DIR, exist_ok=True)
+        with open(get_session_log_path(), 'ab') as file:
+            file.write(line + b"\n")
+    except OSError as e:
+        print(f"Error writing session log: {str(e)}")
+
+def replay_response_log():
+    """Restore responses saved earlier in this session from its log, if any"""
+    try:
+        with open(get_session_log_path(), 'rb') as file:
+            lines = file.readlines()
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        print(f"Error reading session log: {str(e)}")
+        return
+    
+    loads = orjson.loads if orjson else json.loads
+    for line in lines:
+        try:
+            record = loads(line)
+        except ValueError:
+            continue  # Skip a partially written line
+        if not isinstance(record, dict):
+            continue
+        section, question_index, answer = record.get('section'), record.get('q'), record.get('answer')
+        if not isinstance(section, str) or section not in st.session_state.section_sizes:
+            continue
+        if isinstance(question_index, bool) or not isinstance(question_index, int) or not 0 <= question_index < st.session_state.section_sizes[section]:
+            continue
+        if not isinstance(answer, str):
+            continue
+        # The summary and edit screens index fu['question'] / fu['answer']
+        followup = record.get('followup')
+        if not isinstance(followup, list):
+            followup = []
+        followup = [fu for fu in followup if isinstance(fu, dict) and 'question' in fu and 'answer' in fu]
+        timestamp = record.get('timestamp')
+        if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+            timestamp = None  # Exported as null rather than an invented time
+        else:
+            try:
+                datetime.fromtimestamp(timestamp)  # Same conversion the export does
+            except (OverflowError, OSError, ValueError):
+                timestamp = None
+        store_response(section, question_index, Response(answer, followup, timestamp))
+
+def store_response(section, question_index, response):
+    """Store a response in session state and mark its question as answered"""
     if section not in st.session_state.responses:
-        st.session_state.responses[section] = {}
+        # One slot per question, None until answered
+        st.session_state.responses[section] = [None] * st.session_state.section_sizes[section]
     
-    st.session_state.responses[section][question_index] = {
-        'answer': answer,
-        'followup': followup_data or [],
-        'timestamp': datetime.now().isoformat()
-    }
+    st.session_state.responses[section][question_index] = response
     
     # Mark question as answered
-    st.session_state.sections[section][question_index]['answered'] = True
+    question_bit = 1 << question_index
+    if not st.session_state.answered[section] & question_bit:
+        st.session_state.answered[section] |= question_bit
+        st.session_state.answered_counts[section] += 1
+
+def save_response(section, question_index, answer, followup_data=None):
+    """Save response for a question"""
+    response = Response(answer, followup_data or [], time.time())
+    store_response(section, question_index, response)
+    append_response_log(section, question_index, response)
 
 def main():
     st.title("🤖 BRP Questionnaire Assistant")
@@ -290,31 +497,47 @@ def main():
     initialize_session_state()
     
     # Configure Gemini
-    model = configure_gemini()
-    if not model:
+    try:
+        model = configure_gemini()
+    except (KeyError, FileNotFoundError):
+        # Missing key, or no secrets file at all (StreamlitSecretNotFoundError subclasses FileNotFoundError)
+        st.error("GEMINI_API_KEY not found in Streamlit secrets!")
+        st.stop()
+    except Exception as e:
+        st.error(f"Error configuring Gemini: {str(e)}")
         st.stop()
     
     # Load questions
     if not st.session_state.sections:
-        st.session_state.sections = load_questions_from_json()
+        try:
+            st.session_state.sections = load_questions_from_json()
+        except FileNotFoundError:
+            st.error("bpr.json file not found in the current directory!")
+            st.stop()
+        except json.JSONDecodeError:
+            st.error("Invalid JSON format in bpr.json!")
+            st.stop()
         if not st.session_state.sections:
             st.stop()
+        reset_progress_state()
+        replay_response_log()
     
     # Display progress sidebar
     display_progress_sidebar()
     
+    # Editing takes priority so answers can still be edited from the summary
+    if st.session_state.editing_mode:
+        display_editing_interface()
+        return
+    
     # Check if all sections are completed
-    all_sections = list(st.session_state.sections.keys())
-    if len(st.session_state.completed_sections) == len(all_sections):
-        display_summary()
+    if len(get_completed_sections()) == len(st.session_state.section_sizes):
+        display_summary(model)
         return
     
     # Section selection or continuation
-    if not st.session_state.current_section or st.session_state.editing_mode:
-        if not st.session_state.editing_mode:
-            display_section_selection()
-        else:
-            display_editing_interface()
+    if not st.session_state.current_section:
+        display_section_selection()
         return
     
     # Current section and question
@@ -356,9 +579,10 @@ def display_section_selection():
     """Display section selection interface"""
     st.header("📚 Select a Section to Begin")
     
+    completed_sections = get_completed_sections()
     incomplete_sections = []
     for section_name in st.session_state.sections.keys():
-        if section_name not in st.session_state.completed_sections:
+        if section_name not in completed_sections:
             incomplete_sections.append(section_name)
     
     if not incomplete_sections:
@@ -367,7 +591,7 @@ def display_section_selection():
     
     for section_name in incomplete_sections:
         questions = st.session_state.sections[section_name]
-        answered_count = len([q for q in questions if q.get('answered', False)])
+        answered_count = st.session_state.answered_counts[section_name]
         total_count = len(questions)
         
         description = get_section_description(section_name)
@@ -382,8 +606,8 @@ def display_section_selection():
             if st.button(f"Start", key=f"start_{section_name}"):
                 st.session_state.current_section = section_name
                 # Find first unanswered question
-                for i, q in enumerate(questions):
-                    if not q.get('answered', False):
+                for i in range(len(questions)):
+                    if not st.session_state.answered[section_name] & (1 << i):
                         st.session_state.current_question_index = i
                         break
                 st.rerun()
@@ -394,8 +618,8 @@ def display_main_question_interface(model, section, q_index, question):
     """Display main question interface"""
     # Check if already answered
     existing_answer = ""
-    if section in st.session_state.responses and q_index in st.session_state.responses[section]:
-        existing_answer = st.session_state.responses[section][q_index]['answer']
+    if section in st.session_state.responses and st.session_state.responses[section][q_index] is not None:
+        existing_answer = st.session_state.responses[section][q_index].answer
         st.info(f"**Current Answer:** {existing_answer}")
     
     user_answer = st.text_area(
@@ -412,9 +636,14 @@ def display_main_question_interface(model, section, q_index, question):
         if st.button("✅ Submit Answer", type="primary"):
             if user_answer.strip():
                 # Validate response
-                is_adequate, followup_questions = validate_response(
-                    model, question['question'], user_answer, question.get('context')
-                )
+                with st.status("Validating your answer...") as status:
+                    is_adequate, followup_questions = validate_response(
+                        model, question['question'], user_answer, question.get('context')
+                    )
+                    status.update(
+                        label="Answer looks complete" if is_adequate else "A bit more detail is needed",
+                        state="complete"
+                    )
                 
                 if is_adequate:
                     # Save response and move to next question
@@ -489,9 +718,9 @@ def display_followup_interface(model, section, q_index, question):
         st.markdown("### ✅ Follow-up Complete")
         
         # Combine all answers
-        combined_answer = st.session_state.original_answer + "\n\nAdditional Details:\n"
-        for i, fa in enumerate(st.session_state.followup_answers):
-            combined_answer += f"• {fa['question']}: {fa['answer']}\n"
+        parts = [st.session_state.original_answer, "\n\nAdditional Details:\n"]
+        parts.extend(f"• {fa['question']}: {fa['answer']}\n" for fa in st.session_state.followup_answers)
+        combined_answer = "".join(parts)
         
         st.text_area("Final Combined Answer:", value=combined_answer, height=150, disabled=True)
         
@@ -533,16 +762,16 @@ def display_editing_interface():
     
     # Show original answer for reference
     with st.expander("📖 View Original Answer"):
-        st.text(current_response['answer'])
-        if current_response.get('followup'):
+        st.text(current_response.answer)
+        if current_response.followup:
             st.markdown("**Follow-up clarifications:**")
-            for fu in current_response['followup']:
+            for fu in current_response.followup:
                 st.markdown(f"- {fu['question']}: {fu['answer']}")
     
     # Edit field with current answer
     new_answer = st.text_area(
         "Edit Your Answer:",
-        value=current_response['answer'],
+        value=current_response.answer,
         height=150,
         key=f"edit_field_{edit_section}_{edit_q_index}"
     )
@@ -553,8 +782,10 @@ def display_editing_interface():
         if st.button("💾 Save Changes", type="primary", key="save_changes"):
             if new_answer.strip():
                 # Update the response
-                st.session_state.responses[edit_section][edit_q_index]['answer'] = new_answer.strip()
-                st.session_state.responses[edit_section][edit_q_index]['timestamp'] = datetime.now().isoformat()
+                current_response.answer = new_answer.strip()
+                current_response.timestamp = time.time()
+                st.session_state.review_flags.pop((edit_section, edit_q_index), None)
+                append_response_log(edit_section, edit_q_index, current_response)
                 
                 # Exit editing mode
                 st.session_state.editing_mode = False
@@ -571,32 +802,80 @@ def display_editing_interface():
             st.session_state.editing_question = None
             st.rerun()
 
-def display_summary():
+def _build_download_blob(sections, responses_by_section, total_questions) -> bytes:
+    """Build the JSON download payload for all sections and responses"""
+    download_data = {
+        "questionnaire_responses": {},
+        "completion_date": datetime.now().isoformat(),
+        "total_questions": total_questions
+    }
+    
+    for section_name, questions in sections.items():
+        section_responses = []
+        if section_name in responses_by_section:
+            responses = responses_by_section[section_name]
+            
+            for q_index, question in enumerate(questions):
+                response_data = {
+                    "question": question['question'],
+                    "context": question.get('context'),
+                    "category": question.get('category', section_name)
+                }
+                
+                response = responses[q_index]
+                if response is not None:
+                    response_data.update({
+                        "answer": response.answer,
+                        "followup_clarifications": response.followup,
+                        "timestamp": (
+                            datetime.fromtimestamp(response.timestamp).isoformat()
+                            if response.timestamp is not None else None
+                        )
+                    })
+                else:
+                    response_data["answer"] = "Not answered"
+                
+                section_responses.append(response_data)
+        
+        download_data["questionnaire_responses"][section_name] = section_responses
+    
+    if orjson:
+        return orjson.dumps(download_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(download_data, indent=2).encode()
+
+def display_summary(model):
     """Display final summary with all responses"""
     st.header("🎉 Questionnaire Completed!")
     st.success("All sections have been completed. Review your responses below.")
     
     # Summary statistics
-    total_questions = sum(len(questions) for questions in st.session_state.sections.values())
+    total_questions = st.session_state.total_questions
     st.metric("Total Questions Completed", total_questions)
     
     st.markdown("---")
     
-    # Display all responses by section
+    # Display all responses by section, collecting the answers "Validate All" would re-check
+    reviewable = []
     for section_name, questions in st.session_state.sections.items():
         with st.expander(f"📋 {section_name} ({len(questions)} questions)", expanded=False):
             if section_name in st.session_state.responses:
                 responses = st.session_state.responses[section_name]
                 
                 for q_index, question in enumerate(questions):
-                    if q_index in responses:
-                        response = responses[q_index]
+                    response = responses[q_index]
+                    if response is not None:
+                        if response.answer != "Skipped":
+                            reviewable.append((section_name, q_index, question, response.answer))
                         
                         st.markdown(f"**Q{q_index + 1}:** {question['question']}")
                         if question.get('context'):
                             st.caption(f"Context: {question['context']}")
                         
-                        st.markdown(f"**Answer:** {response['answer']}")
+                        st.markdown(f"**Answer:** {response.answer}")
+                        
+                        review_flag = st.session_state.review_flags.get((section_name, q_index))
+                        if review_flag:
+                            st.warning(f"**Needs more detail:** {review_flag}")
                         
                         # Edit button
                         if st.button(f"✏️ Edit", key=f"edit_{section_name}_{q_index}"):
@@ -605,54 +884,48 @@ def display_summary():
                             st.rerun()
                         
                         # Show follow-up details if any
-                        if response.get('followup'):
+                        if response.followup:
                             st.markdown("*Follow-up clarifications:*")
-                            for fu in response['followup']:
+                            for fu in response.followup:
                                 st.markdown(f"- {fu['question']}: {fu['answer']}")
                         
                         st.markdown("---")
     
-    # Download option
-    st.markdown("### 💾 Download Results")
+    # Re-check every answer in batched Gemini requests
+    st.markdown("### 🔍 Review Answers")
+    if st.button("Validate All Answers"):
+        with st.spinner("Validating all answers..."):
+            results, ok = validate_responses_batch(
+                model, [(question['question'], answer, question.get('context')) for _, _, question, answer in reviewable]
+            )
+        
+        if ok:
+            st.session_state.review_flags = {
+                (section_name, q_index): followups[0]
+                for (section_name, q_index, _, _), (is_adequate, followups) in zip(reviewable, results)
+                if not is_adequate
+            }
+            st.rerun()
+        else:
+            st.error("Couldn't validate your answers right now. Please try again.")
     
-    # Prepare data for download
-    download_data = {
-        "questionnaire_responses": {},
-        "completion_date": datetime.now().isoformat(),
-        "total_questions": total_questions
-    }
+    if st.session_state.review_flags:
+        st.caption(f"{len(st.session_state.review_flags)} answer(s) could use more detail - see the sections above.")
     
-    for section_name, questions in st.session_state.sections.items():
-        section_responses = []
-        if section_name in st.session_state.responses:
-            responses = st.session_state.responses[section_name]
-            
-            for q_index, question in enumerate(questions):
-                response_data = {
-                    "question": question['question'],
-                    "context": question.get('context'),
-                    "category": question.get('category', section_name)
-                }
-                
-                if q_index in responses:
-                    response = responses[q_index]
-                    response_data.update({
-                        "answer": response['answer'],
-                        "followup_clarifications": response.get('followup', []),
-                        "timestamp": response['timestamp']
-                    })
-                else:
-                    response_data["answer"] = "Not answered"
-                
-                section_responses.append(response_data)
-        
-        download_data["questionnaire_responses"][section_name] = section_responses
+    # Download option
+    st.markdown("### 💾 Download Results")
     
-    output_json = json.dumps(download_data, indent=2)
+    # Serialized only when the button is clicked, not on every summary rerun
+    build_download = functools.partial(
+        _build_download_blob,
+        st.session_state.sections,
+        st.session_state.responses,
+        total_questions
+    )
     
     st.download_button(
         label="📥 Download Complete Responses (JSON)",
-        data=output_json,
+        data=build_download,
         file_name=f"brp_responses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
         mime="application/json"
     )
@@ -663,6 +936,8 @@ def display_summary():
         for key in list(st.session_state.keys()):
             if key != 'sections':
                 del st.session_state[key]
+        # Start a fresh response log rather than replaying this one
+        st.query_params.pop("session", None)
         st.rerun()
 
 if __name__ == "__main__":